@@ -0,0 +1,85 @@
+import os
+import json
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from ..warehouse.cache import atomic_directory
+from ..utils import (grib_lon_min,
+                     grib_lat_min,
+                     grid_step,
+                     grid_n_rows,
+                     grid_n_columns, )
+
+
+def cell_centers() -> np.ndarray:
+    cells = np.arange(grid_n_rows * grid_n_columns)
+    return np.stack([grib_lon_min + (cells % grid_n_columns + 0.5) * grid_step,
+                     grib_lat_min + (cells // grid_n_columns + 0.5) * grid_step, ],
+                    axis=1)
+
+
+class GeoAtlas(object):
+    meta_filename = 'meta.json'
+
+    def __init__(self,
+                 places: List[str],
+                 arrays: Dict[str, np.ndarray]) -> None:
+        super().__init__()
+        self.places = list(places)
+        self.arrays = arrays
+
+    def gather(self, name: str, cells: np.ndarray) -> np.ndarray:
+        return np.asarray(self.arrays[name][np.asarray(cells)])
+
+    def categorical(self, name: str, cells: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(self.gather(name, cells),
+                                         categories=self.places)
+
+    @classmethod
+    def build(cls,
+              geo_df: pd.DataFrame,
+              count_neighbors: int = 0) -> 'GeoAtlas':
+        n_cells = grid_n_rows * grid_n_columns
+        cells_df = geo_df.loc[(geo_df['grid_index'] >= 0)
+                              & (geo_df['grid_index'] < n_cells), :]
+        cells = cells_df['grid_index'].values
+        codes, places = pd.factorize(cells_df['place'], sort=True)
+
+        arrays = {'population': np.full(n_cells, np.nan, dtype=np.float32),
+                  'place': np.full(n_cells, -1, dtype=np.int16), }
+        arrays['population'][cells] = cells_df['population'].values
+        arrays['place'][cells] = codes
+
+        if count_neighbors > 0:
+            tree = KDTree(geo_df[['city_lon', 'city_lat']])
+            dist, _ = tree.query(cell_centers(), k=count_neighbors)
+            arrays['city_mean_distance'] = dist.mean(axis=1).astype(np.float32)
+            arrays['city_max_distance'] = dist.max(axis=1).astype(np.float32)
+            arrays['city_min_distance'] = dist.min(axis=1).astype(np.float32)
+
+        return cls(places, arrays)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, cls.meta_filename))
+
+    def save(self, path: str) -> None:
+        with atomic_directory(path) as tmp_path:
+            for name, array in self.arrays.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'),
+                        np.ascontiguousarray(array))
+            with open(os.path.join(tmp_path, self.meta_filename), 'w') as file:
+                json.dump({'places': self.places,
+                           'arrays': list(self.arrays.keys()), }, file)
+
+    @classmethod
+    def load(cls, path: str) -> 'GeoAtlas':
+        with open(os.path.join(path, cls.meta_filename), 'r') as file:
+            meta = json.load(file)
+
+        return cls(meta['places'],
+                   {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                    for name in meta['arrays']})
@@ -1,15 +1,26 @@
+import logging
 from abc import ABC, abstractmethod
+from typing import List
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 
+from .history import FireHistory
+from .atlas import GeoAtlas
+from .calendar import Calendar, get_calendar
 from ..warehouse import Engine
 from ..utils import set_grid_index
 
 
 class CalcerBase(ABC):
     name = None
-    keys = ['dt', 'grid_index', ]
+    keys = ['day', 'grid_index', ]
+    tables = ['sample', ]
+    aligned = False
+    dtypes = {'float': 'float32',
+              'integer': 'integer',
+              'object': 'category', }
 
     def __init__(self, engine: Engine) -> None:
         super().__init__()
@@ -19,12 +30,75 @@ class CalcerBase(ABC):
     def compute(self) -> pd.DataFrame:
         pass
 
+    def get_tables(self) -> List[str]:
+        return self.tables
+
+    def get_window(self) -> int:
+        return 0
+
+    def get_shared(self, name: str, factory: callable):
+        return self.engine.get_shared(name, factory)
+
+    def get_calendar(self, days: np.ndarray) -> Calendar:
+        return get_calendar(self.engine, days)
+
+    def get_kind(self, series: pd.Series) -> str:
+        if pd.api.types.is_bool_dtype(series):
+            return 'bool'
+        if pd.api.types.is_float_dtype(series):
+            return 'float'
+        if pd.api.types.is_integer_dtype(series):
+            return 'integer'
+        if (pd.api.types.is_object_dtype(series)
+                or pd.api.types.is_string_dtype(series)):
+            return 'object'
+        return None
+
+    def compact(self, features_df: pd.DataFrame) -> pd.DataFrame:
+        features_df = features_df.copy(deep=False)
+        for column in features_df.columns:
+            if column in self.keys:
+                continue
+
+            dtype = self.dtypes.get(self.get_kind(features_df[column]))
+            if dtype is None:
+                continue
+            if dtype in ['integer', 'signed', 'unsigned', 'float']:
+                features_df[column] = pd.to_numeric(features_df[column], downcast=dtype)
+            else:
+                features_df[column] = features_df[column].astype(dtype)
+
+        return features_df
+
 
 class GeoBaseCalcer(CalcerBase):
+    tables = ['sample', 'geo', ]
+    aligned = True
+
     def __init__(self, engine: Engine) -> None:
         super().__init__(engine)
 
     def prepare_data(self) -> pd.DataFrame:
+        return self.get_shared('geo_prepared', self.build_data)
+
+    def prepare_atlas(self, count_neighbors: int = 0) -> GeoAtlas:
+        return self.get_shared(f'geo_atlas:{count_neighbors}',
+                               lambda: self.build_atlas(count_neighbors))
+
+    def build_atlas(self, count_neighbors: int) -> GeoAtlas:
+        path = self.engine.handles['geo'].path
+        if self.engine.cache is None or path is None:
+            logging.info(f'Build geo atlas - {count_neighbors} neighbors')
+            return GeoAtlas.build(self.prepare_data(), count_neighbors)
+
+        path = self.engine.cache.location(path) + f'.atlas_cn{count_neighbors}'
+        if not GeoAtlas.exists(path):
+            logging.info(f'Build geo atlas - {count_neighbors} neighbors')
+            GeoAtlas.build(self.prepare_data(), count_neighbors).save(path)
+
+        return GeoAtlas.load(path)
+
+    def build_data(self) -> pd.DataFrame:
         geo_df = self.engine.get_table('geo')
 
         geo_df = geo_df.loc[:, ['population', 'place', 'geometry']]
@@ -35,10 +109,11 @@ class GeoBaseCalcer(CalcerBase):
         mask = geo_df['population'].notna()
         geo_df.loc[mask, 'population'] = (geo_df
                                           .loc[mask, 'population']
-                                          .fillna('')
-                                          .apply(lambda x: x.split('(')[0])
+                                          .str.split('(')
+                                          .str[0]
                                           .str.replace(" ", "")
                                           .astype(int))
+        geo_df['population'] = pd.to_numeric(geo_df['population'])
         
         set_grid_index(geo_df, lon_col='city_lon', lat_col='city_lat')
 
@@ -50,3 +125,21 @@ class GeoBaseCalcer(CalcerBase):
                   .reset_index(drop=True))
 
         return geo_df
+
+
+class HistoryBaseCalcer(CalcerBase):
+    tables = ['sample', 'history', ]
+    aligned = True
+
+    def __init__(self, engine: Engine) -> None:
+        super().__init__(engine)
+
+    def prepare_history(self) -> FireHistory:
+        return self.get_shared('fire_history', self.build_history)
+
+    def build_history(self) -> FireHistory:
+        history_df = self.engine.get_table('history')
+        set_grid_index(history_df, 'lon', 'lat')
+
+        return FireHistory(history_df['day'].values,
+                           history_df['grid_index'].values)
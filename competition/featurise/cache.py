@@ -0,0 +1,50 @@
+import os
+import json
+import hashlib
+from typing import List
+
+import pandas as pd
+
+from ..warehouse import Engine
+
+
+class FeatureCache(object):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self,
+            engine: Engine,
+            name: str,
+            args: dict,
+            tables: List[str]) -> str:
+        sample_df = engine.get_table('sample')
+        sample_hash = (pd.util.hash_pandas_object(sample_df, index=False)
+                       .values
+                       .tobytes())
+
+        token = json.dumps({'name': name,
+                            'args': {k: v for k, v in args.items() if k != 'engine'},
+                            'sample_columns': sample_df.columns.tolist(),
+                            'tables': {table: engine.fingerprint(table)
+                                       for table in sorted(tables)
+                                       if table in engine.handles}, },
+                           sort_keys=True,
+                           default=str)
+        return hashlib.sha1(token.encode() + sample_hash).hexdigest()
+
+    def location(self, name: str, key: str) -> str:
+        return os.path.join(self.path, f'{name}_{key[:16]}.pkl')
+
+    def exists(self, name: str, key: str) -> bool:
+        return os.path.exists(self.location(name, key))
+
+    def load(self, name: str, key: str) -> pd.DataFrame:
+        return pd.read_pickle(self.location(name, key))
+
+    def save(self, name: str, key: str, features_df: pd.DataFrame) -> None:
+        location = self.location(name, key)
+        tmp_location = f'{location}.tmp{os.getpid()}'
+        features_df.to_pickle(tmp_location)
+        os.replace(tmp_location, location)
@@ -1,31 +1,36 @@
-import gc
-from typing import List, Union
-from datetime import timedelta
+from typing import List, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from sklearn.neighbors import KDTree
 
-from .base import CalcerBase, GeoBaseCalcer
+from .base import CalcerBase, GeoBaseCalcer, HistoryBaseCalcer
+from .lags import LagIndex
 from ..warehouse import Engine
+from ..warehouse.cube import grib_variables, daily_grid_means
 from ..utils import (era5_all_metrics,
                      era5_all_years,
                      grid_n_rows,
                      grid_n_columns,
-                     set_grid_index,
-                     make_pooling, )
+                     grid_bbox,
+                     to_years, )
+from ..pooling import (pool_grid,
+                       pool_cells,
+                       summed_area_table,
+                       cell_box_sums,
+                       rolling_reduce, )
 
 
 class DatesFeaturesCalcer(CalcerBase):
     name = 'dates_features'
+    aligned = True
 
     def compute(self) -> pd.DataFrame:
         features_df = self.engine.get_table('sample').loc[:, self.keys]
 
-        dt = pd.to_datetime(features_df['dt']).dt
-        features_df.loc[:, 'month'] = dt.month
-        features_df.loc[:, 'week'] = dt.isocalendar().week.astype(int)
-        features_df.loc[:, 'day_of_week'] = dt.dayofweek
+        days = features_df['day'].values
+        calendar = self.get_calendar(days)
+        for column in ['month', 'week', 'day_of_week', ]:
+            features_df.loc[:, column] = calendar.gather(column, days)
 
         return features_df
 
@@ -35,17 +40,12 @@ class GeoCatFeaturesCalcer(GeoBaseCalcer):
 
     def compute(self) -> pd.DataFrame:
         sample_df = self.engine.get_table('sample')
-        geo_df = self.prepare_data()
-
-        features_df = (sample_df
-                       .loc[:, self.keys]
-                       .merge(geo_df,
-                              how='left',
-                              on='grid_index'))
-        features_df = (features_df
-                       .drop(columns=['city_lon', 'city_lat'])
-                       .rename(columns={c: f'geo_{c}' 
-                                        for c in features_df.columns[2:]}))
+        atlas = self.prepare_atlas()
+
+        cells = sample_df['grid_index'].values
+        features_df = sample_df.loc[:, self.keys]
+        features_df['geo_population'] = atlas.gather('population', cells)
+        features_df['geo_place'] = atlas.categorical('place', cells)
 
         return features_df
 
@@ -59,168 +59,261 @@ class GeoNeighborsFeaturesCalcer(GeoBaseCalcer):
 
     def compute(self) -> pd.DataFrame:
         sample_df = self.engine.get_table('sample')
-        geo_df = self.prepare_data()
-
-        tree = KDTree(geo_df[['city_lon', 'city_lat']])
-        metrics = list()
-        for _, row in sample_df.iterrows():
-            lon_center = (row['lon_min'] + row['lon_max']) / 2
-            lat_center = (row['lat_min'] + row['lat_max']) / 2
-            dist, _ = tree.query([[lon_center, lat_center]],
-                                 k=self.count_neighbors)
-            if len(dist) > 0:
-                metrics.append((np.mean(dist),
-                                np.max(dist),
-                                np.min(dist), ))
-            else:
-                metrics.append((np.nan, ) * 3)
-        features_df = pd.DataFrame(metrics,
-                                   columns=['city_mean_distance',
-                                            'city_max_distance',
-                                            'city_min_distance', ],
-                                   index=sample_df.index)
-                                   
-        features_df = (sample_df
-                       .loc[:, self.keys]
-                       .join(features_df,
-                             how='left'))
-        features_df = (features_df
-                       .rename(columns={c: f'geo_cn{self.count_neighbors}_{c}' 
-                                        for c in features_df.columns[2:]}))
+        atlas = self.prepare_atlas(self.count_neighbors)
+
+        cells = sample_df['grid_index'].values
+        features_df = sample_df.loc[:, self.keys]
+        for column in ['city_mean_distance', 'city_max_distance', 'city_min_distance', ]:
+            features_df[f'geo_cn{self.count_neighbors}_{column}'] = atlas.gather(column, cells)
 
         return features_df
 
 
 class GribFeaturesCalcer(CalcerBase):
     name = 'grib_features'
-    ufunc_map = {'max': np.nanmax,
-                 'min': np.nanmin,
-                 'mean': np.nanmean, }
+    aligned = True
+    batch_days = 16
 
     def __init__(self, engine: Engine,
                  metrics: Union[str, List[str]], 
-                 pooling_size: int,
+                 pooling_size: Union[int, List[int]],
                  lags: List[int],
-                 agg_funcs: List[str]) -> None:
+                 agg_funcs: List[str],
+                 use_cube: bool = False,
+                 pooling_mode: str = 'sparse',
+                 rolling_windows: List[int] = [],
+                 rolling_funcs: List[str] = ['mean']) -> None:
         super().__init__(engine)
 
         self.metrics = metrics if metrics != '*' else era5_all_metrics
-        self.pooling_size = pooling_size
+        self.pooling_sizes = ([pooling_size] if isinstance(pooling_size, int)
+                              else list(pooling_size))
         self.lags = lags
         self.agg_funcs = agg_funcs
+        self.use_cube = use_cube
+        self.pooling_mode = pooling_mode
+        self.rolling_windows = rolling_windows
+        self.rolling_funcs = rolling_funcs
+
+    def get_tables(self) -> List[str]:
+        days = self.engine.get_table('sample')['day'].values
+        years = to_years(np.arange(days.min() - self.get_window(), days.max() + 1))
+        return self.tables + [f'{metric}_{year}'
+                              for metric in self.metrics
+                              for year in era5_all_years
+                              if year in years]
+
+    def get_window(self) -> int:
+        return max(self.lags + [window - 1 for window in self.rolling_windows])
 
     def compute(self) -> pd.DataFrame:
         sample_df = self.engine.get_table('sample').loc[:, self.keys]
-        
-        years = list(pd.to_datetime(sample_df['dt']).dt.year.unique())
-        dt_min = pd.to_datetime(sample_df['dt']).min() - pd.DateOffset(max(self.lags))
-        dt_max = pd.to_datetime(sample_df['dt']).max() - pd.DateOffset(min(self.lags))
-        years = list(sorted(set(years + [dt_min.year, dt_max.year])))
 
-        dates = pd.to_datetime(sample_df['dt']).dt.date.unique()
-        for lag in self.lags:
-            dates = np.concatenate([dates, dates - timedelta(days=lag)])
-        dates = list(np.unique(dates))
-        
-        grid_idxs = list(sample_df['grid_index'].unique())
-        all_grid_idxs_df = pd.DataFrame(index=pd.RangeIndex(stop=grid_n_rows * grid_n_columns,
-                                                            name='grid_index'))
-
-        features_df = sample_df.copy()
-        
-        for metric in self.metrics:
-            parts = list()
-            for year in years:
-                if year not in era5_all_years:
-                    continue
-                grib_ds = (self.engine
-                           .get_table(f'{metric}_{year}'))
-
-                set_grid_index(grib_ds,
-                               lon_col='longitude', 
-                               lat_col='latitude', )
-
-                for dt, group_ds in grib_ds.groupby(grib_ds['time'].dt.date):
-                    if not dt in dates:
-                        continue
-
-                    group_df = (group_ds
-                                .to_dataframe()
-                                .groupby('grid_index')[list(grib_ds.keys())[:-1]].mean())
-                    group_df = all_grid_idxs_df.join(group_df, how='left')
-
-                    for column in group_df.columns:
-                        for func in self.agg_funcs:
-                            name = f'{metric}_{column}_ws{self.pooling_size}_{func}'
-                            group_df.loc[:, name] = make_pooling(group_df[column].values,
-                                                                 self.pooling_size,
-                                                                 self.ufunc_map[func])
-                        del group_df[column]
-
-                    group_df = (group_df
-                                .loc[(group_df.notna().any(axis=1) 
-                                     & group_df.index.isin(grid_idxs)), :]
-                                .reset_index()
-                                .assign(dt=str(dt)))
-                        
-                    parts.append(group_df)
-
-            metric_df = pd.concat(parts)
-            columns = list(set(metric_df.columns) - set(self.keys))
-
-            del parts
-            gc.collect()
+        days = sample_df['day'].values
+        lag_index = LagIndex(days,
+                             sample_df['grid_index'].values,
+                             self.lags)
+        series_days = (np.arange(days.min() - max(self.rolling_windows) + 1, days.max() + 1)
+                       if self.rolling_windows else np.array([], dtype=days.dtype))
+        bbox = grid_bbox(lag_index.cells, margin=max(self.pooling_sizes) // 2)
 
+        features = dict()
+        for metric in self.metrics:
+            variables, pooled, series = self.process_metric(metric,
+                                                            lag_index,
+                                                            series_days,
+                                                            bbox)
+            if variables is None:
+                continue
+
+            columns = [f'{metric}_{v}_ws{size}_{func}'
+                       for size in self.pooling_sizes
+                       for func in self.agg_funcs
+                       for v in variables]
             for lag in self.lags:
-                features_df['dt'] = ((pd.to_datetime(sample_df['dt']) - pd.DateOffset(lag))
-                                     .dt.strftime('%Y-%m-%d'))
-                    
-                features_df = (features_df
-                               .merge(metric_df.rename(columns={c: f'{c}_lag_{lag}' 
-                                                                for c in columns}),
-                                      how='left',
-                                      on=['dt', 'grid_index'], ))
-
-            del metric_df 
-            gc.collect()
-        
-        features_df.loc[:, 'dt'] = sample_df['dt']
-        return features_df
-
-
-class LagsFeaturesCalcer(CalcerBase):
+                lag_values = lag_index.gather(pooled, lag)
+                for c, column in enumerate(columns):
+                    features[f'{column}_lag_{lag}'] = lag_values[:, c]
+
+            day_pos = np.searchsorted(series_days, days)
+            for window in self.rolling_windows:
+                results = rolling_reduce(series, window, self.rolling_funcs)
+                for func in self.rolling_funcs:
+                    window_values = results[func][day_pos, lag_index.cell_pos]
+                    for v, variable in enumerate(variables):
+                        features[f'{metric}_{variable}_rw{window}_{func}'] = window_values[:, v]
+
+        return pd.concat([sample_df,
+                          pd.DataFrame(features, index=sample_df.index)],
+                         axis=1)
+
+    def load_daily(self,
+                   name: str,
+                   need_days: np.ndarray,
+                   bbox: Tuple[float, float, float, float]) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+        if self.use_cube:
+            cube = self.engine.get_cube(name)
+            pos, found = cube.day_index(need_days)
+            return need_days[found], cube.variables, cube.values, pos[found]
+
+        grib_ds = self.engine.get_table(name,
+                                        dates=need_days.astype('datetime64[D]'),
+                                        bbox=bbox)
+        variables = grib_variables(grib_ds)
+        days, values = daily_grid_means(grib_ds, variables)
+        return days, variables, values, np.arange(len(days))
+
+    def pool_batch(self,
+                   values: np.ndarray,
+                   grid_idxs: np.ndarray) -> np.ndarray:
+        values = np.moveaxis(values, 2, 1)
+        if self.pooling_mode == 'sparse':
+            results = pool_cells(values,
+                                 grid_idxs,
+                                 self.pooling_sizes,
+                                 self.agg_funcs)
+        else:
+            results = {key: result[:, :, grid_idxs]
+                       for key, result in pool_grid(values,
+                                                    self.pooling_sizes,
+                                                    self.agg_funcs).items()}
+
+        return np.concatenate([np.moveaxis(results[size, func], 1, 2)
+                               for size in self.pooling_sizes
+                               for func in self.agg_funcs],
+                              axis=2)
+
+    def process_metric(self,
+                       metric: str,
+                       lag_index: LagIndex,
+                       series_days: np.ndarray,
+                       bbox: Tuple[float, float, float, float]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        need_days = np.union1d(lag_index.need_days, series_days)
+        years = to_years(need_days)
+
+        names = ([f'{metric}_{year}' for year in years if year in era5_all_years]
+                 or [name for name in (f'{metric}_{year}' for year in era5_all_years)
+                     if name in self.engine.handles][:1])
+
+        variables, pooled, series = None, None, None
+        for name in names:
+            days, year_variables, values, pos = self.load_daily(name,
+                                                                need_days,
+                                                                bbox)
+            if variables is None:
+                variables = year_variables
+                n_columns = len(self.pooling_sizes) * len(self.agg_funcs) * len(variables)
+                pooled = np.full((len(lag_index.need_days), len(lag_index.cells), n_columns),
+                                 np.nan,
+                                 dtype=np.float32)
+                series = np.full((len(series_days), len(lag_index.cells), len(variables)),
+                                 np.nan,
+                                 dtype=np.float32)
+
+            for start in range(0, len(days), self.batch_days):
+                batch_days = days[start:start + self.batch_days]
+                batch_values = np.asarray(values[pos[start:start + self.batch_days]])
+
+                mask = np.isin(batch_days, lag_index.need_days)
+                if mask.any():
+                    pooled[np.searchsorted(lag_index.need_days, batch_days[mask])] = \
+                        self.pool_batch(batch_values[mask], lag_index.cells)
+
+                mask = np.isin(batch_days, series_days)
+                if mask.any():
+                    series[np.searchsorted(series_days, batch_days[mask])] = \
+                        batch_values[mask][:, lag_index.cells]
+
+        return variables, pooled, series
+
+
+class LagsFeaturesCalcer(HistoryBaseCalcer):
     name = 'lags_features'
-    def __init__(self, engine: Engine, lags: List[int]) -> None:
+    def __init__(self, engine: Engine,
+                 lags: List[int],
+                 windows: List[int] = []) -> None:
         super().__init__(engine)
         self.lags = lags
+        self.windows = windows
+
+    def get_window(self) -> int:
+        return max(self.lags + self.windows)
 
     def compute(self) -> pd.DataFrame:
-        sample_df = self.engine.get_table('sample')
-        history_df = self.engine.get_table('history')
-        set_grid_index(history_df, 'lon', 'lat')
+        sample_df = self.engine.get_table('sample').loc[:, self.keys]
+        history = self.prepare_history()
 
-        infire_nflag = history_df.groupby(['grid_index', 'dt']).size()
-        infire_nflag = (infire_nflag > 0).astype(int)
-        infire_nflag.name = 'infire'
-        infire_df = infire_nflag.reset_index()
+        days = sample_df['day'].values
+        cells = sample_df['grid_index'].values
 
-        target_df = sample_df.loc[:, self.keys].copy()
+        features = dict()
         for lag in self.lags:
-            target_df['dt'] = ((pd.to_datetime(sample_df['dt']) - pd.DateOffset(lag))
-                               .dt.strftime('%Y-%m-%d'))
+            features[f'infire_lag_day_{lag}'] = history.flags(days - lag, cells)
+        for window in self.windows:
+            features[f'infire_last_{window}_days'] = history.counts(days - window,
+                                                                   days - 1,
+                                                                   cells)
 
-            target_df = (target_df
-                         .merge(infire_df.rename(columns={'infire': f'infire_lag_day_{lag}'}),
-                                how='left',))
+        return pd.concat([sample_df,
+                          pd.DataFrame(features, index=sample_df.index)],
+                         axis=1)
 
-        target_df['dt'] = sample_df.loc[:, 'dt']
-        target_df.fillna(0, inplace=True)
 
-        return target_df
+class FiresNeighborhoodFeaturesCalcer(HistoryBaseCalcer):
+    name = 'fires_neighborhood_features'
+
+    def __init__(self, engine: Engine,
+                 radii: List[int],
+                 windows: List[int]) -> None:
+        super().__init__(engine)
+        self.radii = radii
+        self.windows = windows
+
+    def get_window(self) -> int:
+        return max(self.windows)
+
+    def compute(self) -> pd.DataFrame:
+        sample_df = self.engine.get_table('sample').loc[:, self.keys]
+        history_days, history_cells = self.prepare_history().decode()
+
+        inside = (history_cells >= 0) & (history_cells < grid_n_rows * grid_n_columns)
+        order = np.argsort(history_days[inside], kind='stable')
+        history_days = history_days[inside][order]
+        history_cells = history_cells[inside][order]
+
+        days = sample_df['day'].values
+        cells, cell_pos = np.unique(sample_df['grid_index'].values, return_inverse=True)
+        bounds = np.unique(np.concatenate([days - 1]
+                                          + [days - window - 1 for window in self.windows]))
+
+        grid = np.zeros(grid_n_rows * grid_n_columns, dtype=np.int64)
+        sums = np.zeros((len(bounds), len(cells), len(self.radii)), dtype=np.int64)
+        stops = np.searchsorted(history_days, bounds, side='right')
+        start = 0
+        for b, stop in enumerate(stops):
+            grid += np.bincount(history_cells[start:stop], minlength=len(grid))
+            start = stop
+
+            table = summed_area_table(grid.reshape(grid_n_rows, grid_n_columns))
+            for r, radius in enumerate(self.radii):
+                sums[b, :, r] = cell_box_sums(table, cells, 2 * radius + 1)
+
+        last = sums[np.searchsorted(bounds, days - 1), cell_pos]
+        features = dict()
+        for window in self.windows:
+            first = sums[np.searchsorted(bounds, days - window - 1), cell_pos]
+            for r, radius in enumerate(self.radii):
+                features[f'infire_r{radius}_last_{window}_days'] = last[:, r] - first[:, r]
+
+        return pd.concat([sample_df,
+                          pd.DataFrame(features, index=sample_df.index)],
+                         axis=1)
 
 
 class TargetBaseCalcer(CalcerBase): 
     name = 'target_base'
+    aligned = True
+    dtypes = dict(CalcerBase.dtypes, float='integer')
 
     def compute(self) -> pd.DataFrame:
         sample_df = self.engine.get_table('sample')
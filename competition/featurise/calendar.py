@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from ..warehouse import Engine
+
+
+class Calendar(object):
+    def __init__(self,
+                 first_day: int,
+                 last_day: int) -> None:
+        super().__init__()
+        self.first_day = first_day
+        self.days = np.arange(first_day, last_day + 1, dtype=np.int32)
+
+        dates = pd.DatetimeIndex(self.days.astype('datetime64[D]'))
+        weeks = dates.isocalendar().week.values.astype(np.int32)
+        self.table = pd.DataFrame({'day': self.days,
+                                   'dt': dates.strftime('%Y-%m-%d'),
+                                   'month': dates.month,
+                                   'week': weeks,
+                                   'day_of_week': dates.dayofweek,
+                                   'day_of_year': dates.dayofyear, })
+
+    def codes(self, days: np.ndarray) -> np.ndarray:
+        return np.asarray(days) - self.first_day
+
+    def gather(self, column: str, days: np.ndarray) -> np.ndarray:
+        return self.table[column].values[self.codes(days)]
+
+
+def get_calendar(engine: Engine, days: np.ndarray) -> Calendar:
+    first_day, last_day = int(np.min(days)), int(np.max(days))
+    return engine.get_shared(f'calendar:{first_day}:{last_day}',
+                             lambda: Calendar(first_day, last_day))
@@ -1,36 +1,238 @@
+import json
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from .base import CalcerBase
+from .cache import FeatureCache
+from .store import FeatureStore
+from .calendar import get_calendar
 from ..warehouse import Engine
 from ..repository import Repository
+from ..utils import to_day_ordinal, from_day_ordinal
 
 
 class Featuriser():
     def __init__(self,
                  engine: Engine, 
-                 repository: Repository, ) -> None:
+                 repository: Repository,
+                 workers: int = 1,
+                 cache_path: str = None,
+                 dtypes: dict = None, ) -> None:
         self.engine = engine
         self.repository = repository
+        self.workers = workers
+        self.dtypes = dtypes or dict()
+        self.profiler = engine.profiler
+        if self.profiler.profile_path is not None and self.workers > 1:
+            logging.info(f'Profile - run calcers sequentially instead of {self.workers} workers')
+            self.workers = 1
+        self.cache = FeatureCache(cache_path) if cache_path is not None else None
 
     def create_calcer(self, name: str, args: dict = {}) -> CalcerBase:
         args['engine'] = self.engine
 
-        return self.repository.get_object(name)(**args)
+        calcer = (self.repository
+                  .get_object(name)(**{key: value
+                                       for key, value in args.items()
+                                       if key != 'dtypes'}))
+        calcer.dtypes = {**calcer.dtypes,
+                         **self.dtypes,
+                         **args.get('dtypes', dict())}
 
+        return calcer
+
+    def compute(self, name: str, calcer: CalcerBase, args: dict) -> pd.DataFrame:
+        if self.cache is not None:
+            key = self.cache.key(self.engine,
+                                 name,
+                                 dict(args, dtypes=calcer.dtypes),
+                                 calcer.get_tables())
+            if self.cache.exists(name, key):
+                logging.info(f'Load cached - {name}')
+                return self.cache.load(name, key)
+
+        logging.info(f'Compute - {name}')
+        with self.profiler.stage(f'compute:{name}',
+                                 rows_in=len(self.engine.get_table('sample')),
+                                 profile=True) as record:
+            features_df = calcer.compact(calcer.compute())
+            self.profiler.output(record, features_df)
+        logging.info(f'Computed - {name} ({record["wall_time"]:.1f}s)')
+
+        if self.cache is not None:
+            self.cache.save(name, key, features_df)
+
+        return features_df
     
     def get_features(self,
                      config: dict,)-> pd.DataFrame:
-        keys = ['dt', 'grid_index']
-        dataframes = list()   
-        for name, args in config.items():
-            logging.info(f'Compute - {name}')
-            calcer = self.create_calcer(name, args)
-            dataframes.append(calcer.compute())
+        names = list(config.keys())
+        args = list(config.values())
+        calcers = [self.create_calcer(name, args) for name, args in config.items()]
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                dataframes = list(executor.map(self.compute, names, calcers, args))
+        else:
+            dataframes = list(map(self.compute, names, calcers, args))
+
+        with self.profiler.stage('combine',
+                                 rows_in=sum(map(len, dataframes))) as record:
+            features_df = self.to_output(self.combine(calcers, dataframes))
+            self.profiler.output(record, features_df)
+
+        return features_df
+
+    def is_aligned(self, calcers: list, dataframes: list) -> bool:
+        if not all(calcer.aligned for calcer in calcers):
+            return False
+
+        keys = CalcerBase.keys
+        columns = set()
+        for df in dataframes:
+            if len(df) != len(dataframes[0]):
+                return False
+            for key in keys:
+                if not np.array_equal(df[key].values, dataframes[0][key].values):
+                    return False
 
+            df_columns = set(df.columns) - set(keys)
+            if columns & df_columns:
+                return False
+            columns |= df_columns
+
+        return True
+
+    def combine(self, calcers: list, dataframes: list) -> pd.DataFrame:
+        keys = CalcerBase.keys
+        if self.is_aligned(calcers, dataframes):
+            return pd.concat([dataframes[0].reset_index(drop=True)]
+                             + [df.drop(columns=keys).reset_index(drop=True)
+                                for df in dataframes[1:]],
+                             axis=1)
+
+        logging.info('Calcers outputs are not aligned, merge')
         features_df = dataframes[0]
         for df in dataframes[1:]:
             features_df = features_df.merge(df, how='outer', on=keys)
 
-        return features_df
\ No newline at end of file
+        return features_df
+
+    def to_output(self, features_df: pd.DataFrame) -> pd.DataFrame:
+        days = features_df['day'].values
+        features_df.insert(0, 'dt', get_calendar(self.engine, days).gather('dt', days))
+
+        return features_df.drop(columns=['day'])
+
+    def get_day_hashes(self, name: str, columns: list = None) -> dict:
+        table = self.engine.get_table(name)
+        order = np.argsort(table['day'].values, kind='stable')
+        days, starts = np.unique(table['day'].values[order], return_index=True)
+        hashes = (pd.util.hash_pandas_object(table if columns is None else table.loc[:, columns],
+                                             index=False)
+                  .values[order])
+
+        return dict(zip(from_day_ordinal(days).tolist(),
+                        map(str, np.add.reduceat(hashes, starts) if len(days) else [])))
+
+    def get_config_hash(self, config: dict) -> str:
+        token = json.dumps({'calcers': {name: {key: value
+                                               for key, value in args.items()
+                                               if key != 'engine'}
+                                        for name, args in config.items()},
+                            'dtypes': self.dtypes, },
+                           sort_keys=True,
+                           default=str)
+        return hashlib.sha1(token.encode()).hexdigest()
+
+    def get_manifest(self, config: dict) -> dict:
+        tables = {table
+                  for name, args in config.items()
+                  for table in self.create_calcer(name, args).get_tables()
+                  if table in self.engine.handles}
+
+        era5_days = dict()
+        for name in sorted(tables):
+            if self.engine.handles[name].format == 'grib':
+                days = self.engine.get_days(name)
+                era5_days[name] = [int(days.min()), int(days.max())]
+
+        return {'config_hash': self.get_config_hash(config),
+                'sample_hashes': self.get_day_hashes('sample'),
+                'history_hashes': (self.get_day_hashes('history', ['lon', 'lat'])
+                                   if 'history' in tables else dict()),
+                'era5_days': era5_days, }
+
+    def get_changed_days(self, hashes: dict, stored_hashes: dict) -> np.ndarray:
+        return to_day_ordinal([dt for dt in set(hashes) | set(stored_hashes)
+                               if hashes.get(dt) != stored_hashes.get(dt)])
+
+    def get_new_days(self, manifest: dict, stored_manifest: dict) -> np.ndarray:
+        new_days = [self.get_changed_days(manifest['history_hashes'],
+                                          stored_manifest.get('history_hashes', dict()))]
+
+        stored_era5_days = stored_manifest.get('era5_days', dict())
+        for name, (first_day, last_day) in manifest['era5_days'].items():
+            stored_last_day = stored_era5_days.get(name, [first_day, first_day - 1])[1]
+            new_days.append(np.arange(max(first_day, stored_last_day + 1), last_day + 1))
+
+        return np.unique(np.concatenate(new_days)).astype(np.int32)
+
+    def write(self,
+              config: dict,
+              store: FeatureStore,
+              mask: np.ndarray = None,
+              chunk_days: int = None) -> None:
+        sample_df = self.engine.get_table('sample')
+        sample_days = sample_df['day'].values
+        mask = np.ones(len(sample_df), dtype=bool) if mask is None else mask
+
+        days = np.unique(sample_days[mask])
+        chunk_days = chunk_days or max(len(days), 1)
+        chunks = [days[start:start + chunk_days]
+                  for start in range(0, len(days), chunk_days)]
+
+        for i, chunk in enumerate(chunks, 1):
+            chunk_mask = mask & np.isin(sample_days, chunk)
+            logging.info(f'Featurise chunk - {i}/{len(chunks)}, '
+                         f'{len(chunk)} dates, {chunk_mask.sum()} rows')
+            with self.profiler.stage(f'chunk:{i}', rows_in=int(chunk_mask.sum())) as record:
+                with self.engine.override_table('sample', sample_df.loc[chunk_mask, :]):
+                    features_df = self.get_features(config)
+                    store.write(features_df)
+                self.profiler.output(record, features_df)
+
+    def update(self,
+               config: dict,
+               store: FeatureStore,
+               chunk_days: int = None) -> None:
+        sample_df = self.engine.get_table('sample')
+        window = max([self.create_calcer(name, args).get_window()
+                      for name, args in config.items()] + [0])
+
+        manifest = self.get_manifest(config)
+        stored_manifest = store.read_manifest()
+        if manifest['config_hash'] != stored_manifest.get('config_hash'):
+            logging.info('Update - calcers config changed, rebuild all dates')
+            store.clear()
+
+        changed_days = self.get_changed_days(manifest['sample_hashes'],
+                                             stored_manifest.get('sample_hashes', dict()))
+        new_days = self.get_new_days(manifest, stored_manifest)
+        stored_days = to_day_ordinal(store.partitions())
+        store.remove(from_day_ordinal(np.setdiff1d(stored_days, sample_df['day'].values)))
+
+        sample_days = sample_df['day'].values
+        affected = ~np.isin(sample_days, stored_days) | np.isin(sample_days, changed_days)
+        for lag in range(window + 1):
+            affected |= np.isin(sample_days - lag, new_days)
+
+        logging.info(f'Update - {len(np.unique(sample_days[affected]))} dates, '
+                     f'{affected.sum()} rows')
+        self.write(config, store, affected, chunk_days)
+
+        store.write_manifest(manifest)
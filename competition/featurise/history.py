@@ -0,0 +1,42 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class FireHistory(object):
+    def __init__(self,
+                 days: np.ndarray,
+                 cells: np.ndarray) -> None:
+        super().__init__()
+        days = np.asarray(days, dtype=np.int64)
+        cells = np.asarray(cells, dtype=np.int64)
+
+        self.day_min = int(days.min()) if len(days) else 0
+        self.day_span = int(days.max()) - self.day_min + 1 if len(days) else 1
+        self.keys = np.unique(cells * self.day_span + (days - self.day_min))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (self.keys % self.day_span + self.day_min,
+                self.keys // self.day_span, )
+
+    def offsets(self, days: np.ndarray) -> np.ndarray:
+        return np.asarray(days, dtype=np.int64) - self.day_min
+
+    def flags(self,
+              days: np.ndarray,
+              cells: np.ndarray) -> np.ndarray:
+        return (self.counts(days, days, cells) > 0).astype(np.uint8)
+
+    def counts(self,
+               first_days: np.ndarray,
+               last_days: np.ndarray,
+               cells: np.ndarray) -> np.ndarray:
+        cells = np.asarray(cells, dtype=np.int64) * self.day_span
+        first = self.offsets(first_days).clip(0, self.day_span)
+        last = self.offsets(last_days).clip(-1, self.day_span - 1)
+
+        return (np.searchsorted(self.keys, cells + last, side='right')
+                - np.searchsorted(self.keys, cells + first, side='left')).clip(min=0)
@@ -0,0 +1,21 @@
+from typing import List
+
+import numpy as np
+
+
+class LagIndex(object):
+    def __init__(self,
+                 days: np.ndarray,
+                 cells: np.ndarray,
+                 lags: List[int]) -> None:
+        super().__init__()
+        self.days = np.asarray(days)
+        self.lags = list(lags)
+
+        self.need_days = np.unique(np.concatenate([self.days - lag for lag in self.lags]))
+        self.cells, self.cell_pos = np.unique(np.asarray(cells), return_inverse=True)
+        self.day_pos = {lag: np.searchsorted(self.need_days, self.days - lag)
+                        for lag in self.lags}
+
+    def gather(self, values: np.ndarray, lag: int) -> np.ndarray:
+        return values[self.day_pos[lag], self.cell_pos]
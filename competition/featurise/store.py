@@ -0,0 +1,78 @@
+import os
+import json
+from typing import List
+
+import pandas as pd
+
+
+class FeatureStore(object):
+    manifest_filename = 'manifest.json'
+    partition_prefix = 'dt='
+    partition_suffix = '.parquet'
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def partition_path(self, dt: str) -> str:
+        return os.path.join(self.path,
+                            f'{self.partition_prefix}{dt}{self.partition_suffix}')
+
+    def partitions(self) -> List[str]:
+        return sorted(filename[len(self.partition_prefix):-len(self.partition_suffix)]
+                      for filename in os.listdir(self.path)
+                      if (filename.startswith(self.partition_prefix)
+                          and filename.endswith(self.partition_suffix)))
+
+    def write(self, features_df: pd.DataFrame) -> None:
+        for dt, part_df in features_df.groupby('dt', sort=False):
+            path = self.partition_path(dt)
+            tmp_path = f'{path}.tmp{os.getpid()}'
+            part_df.reset_index(drop=True).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+    def columns(self) -> List[str]:
+        partitions = self.partitions()
+        if not partitions:
+            return list()
+
+        import pyarrow.parquet as pq
+        return pq.read_schema(self.partition_path(partitions[0])).names
+
+    def read(self, columns: List[str] = None) -> pd.DataFrame:
+        partitions = self.partitions()
+        if not partitions:
+            raise FileNotFoundError(f'No feature partitions in {self.path}, '
+                                    'run featurise first')
+
+        parts = [pd.read_parquet(self.partition_path(dt), columns=columns)
+                 for dt in partitions]
+        categorical = [column for column, dtype in parts[0].dtypes.items()
+                       if isinstance(dtype, pd.CategoricalDtype)]
+
+        features_df = pd.concat(parts, ignore_index=True)
+        for column in categorical:
+            features_df[column] = features_df[column].astype('category')
+
+        return features_df
+
+    def remove(self, dts: List[str]) -> None:
+        for dt in dts:
+            os.remove(self.partition_path(dt))
+
+    def clear(self) -> None:
+        self.remove(self.partitions())
+        if os.path.exists(os.path.join(self.path, self.manifest_filename)):
+            os.remove(os.path.join(self.path, self.manifest_filename))
+
+    def read_manifest(self) -> dict:
+        path = os.path.join(self.path, self.manifest_filename)
+        if not os.path.exists(path):
+            return dict()
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def write_manifest(self, manifest: dict) -> None:
+        with open(os.path.join(self.path, self.manifest_filename), 'w') as file:
+            json.dump(manifest, file)
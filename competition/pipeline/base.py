@@ -1,4 +1,5 @@
 from abc import ABC, abstractclassmethod, abstractmethod
+from typing import List
 
 import pandas as pd
 from sklearn.compose import ColumnTransformer
@@ -9,6 +10,9 @@ from ..repository import Repository
 
 class PipelineBase(ABC):
     name = None
+    keys = ['dt', 'grid_index', ]
+    targets = ['infire_day_num'] + [f'infire_day_{i}' for i in range(1, 9)]
+    fit_targets = targets
 
     def __init__(self, seed: int) -> None:
         super().__init__()
@@ -33,6 +37,12 @@ class PipelineBase(ABC):
     def load(path: str) -> None:
         pass
 
+    def get_features(self, columns: List[str]) -> List[str]:
+        return sorted(set(columns) - set(self.targets) - set(self.keys))
+
+    def get_columns(self, columns: List[str]) -> List[str]:
+        return ['dt'] + self.get_features(columns) + self.fit_targets
+
     def get_pipeline(self, config: dict, **kwargs) -> _Pipeline:
         steps = list()
 
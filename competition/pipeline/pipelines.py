@@ -31,9 +31,7 @@ class BaselinePipeline(PipelineBase):
         split_dt = pd.to_datetime(self.config['split_dt'])
 
         targets = list(self.models.keys())
-        self.features = list(set(features_df.columns.tolist()) 
-                             - set(targets) 
-                             - set(['dt', 'grid_index']))
+        self.features = self.get_features(features_df.columns)
 
         features_df = features_df.sort_values(by='dt', ascending=True)
 
@@ -139,6 +137,7 @@ class BaselinePipeline(PipelineBase):
 
 class LagsPipeline(PipelineBase):
     name = 'lags_pipeline'
+    fit_targets = ['infire_day_num', ]
 
     def __init__(self, seed: int) -> None:
         super().__init__(seed)
@@ -153,10 +152,7 @@ class LagsPipeline(PipelineBase):
         self.config = config
         self.repository = repository
 
-        targets = ['infire_day_num'] + [f'infire_day_{i}' for i in range(1, 9)]
-        self.features = list(sorted(set(features_df.columns.tolist()) 
-                                    - set(targets) 
-                                    - set(['dt', 'grid_index'])))
+        self.features = self.get_features(features_df.columns)
 
         logging.info(f'Fit')
         
@@ -0,0 +1,237 @@
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from .utils import grid_n_rows, grid_n_columns
+
+
+pooling_funcs = ['max', 'min', 'mean', ]
+
+
+def sliding_extrema(array: np.ndarray,
+                    size: int,
+                    ufunc: np.ufunc,
+                    fill: float,
+                    axis: int = -1,
+                    lo: int = None) -> np.ndarray:
+    lo = size // 2 if lo is None else lo
+    array = np.moveaxis(array, axis, -1)
+    n = array.shape[-1]
+
+    length = -(-(n + size - 1) // size) * size
+    padded = np.full(array.shape[:-1] + (length, ), fill, dtype=array.dtype)
+    padded[..., lo:lo + n] = array
+
+    blocks = padded.reshape(array.shape[:-1] + (length // size, size))
+    prefix = ufunc.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = (ufunc.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1]
+              .reshape(padded.shape))
+
+    result = ufunc(suffix[..., :n], prefix[..., size - 1:size - 1 + n])
+    return np.moveaxis(result, -1, axis)
+
+
+def rolling_reduce(series: np.ndarray,
+                   window: int,
+                   funcs: List[str]) -> Dict[str, np.ndarray]:
+    isnan = np.isnan(series)
+
+    def window_sums(array: np.ndarray) -> np.ndarray:
+        cumsum = np.zeros((array.shape[0] + 1, ) + array.shape[1:])
+        np.cumsum(array, axis=0, out=cumsum[1:])
+        stops = np.arange(1, array.shape[0] + 1)
+        return cumsum[stops] - cumsum[(stops - window).clip(min=0)]
+
+    counts = window_sums(~isnan)
+    empty = counts == 0
+    sums = (window_sums(np.where(isnan, 0, series))
+            if {'mean', 'sum'} & set(funcs) else None)
+
+    results = dict()
+    for func in funcs:
+        if func == 'sum':
+            result = sums
+        elif func == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = sums / counts
+        elif func == 'max':
+            result = sliding_extrema(np.where(isnan, -np.inf, series),
+                                     window, np.maximum, -np.inf,
+                                     axis=0, lo=window - 1)
+        elif func == 'min':
+            result = sliding_extrema(np.where(isnan, np.inf, series),
+                                     window, np.minimum, np.inf,
+                                     axis=0, lo=window - 1)
+        else:
+            raise NotImplementedError
+
+        result = result.astype(series.dtype)
+        result[empty] = np.nan
+        results[func] = result
+
+    return results
+
+
+def box_extrema(grid: np.ndarray,
+                size: int,
+                ufunc: np.ufunc,
+                fill: float,
+                lo: int = None) -> np.ndarray:
+    result = sliding_extrema(grid, size, ufunc, fill, axis=-2, lo=lo)
+    return sliding_extrema(result, size, ufunc, fill, axis=-1, lo=lo)
+
+
+def pyramid_extrema(grid: np.ndarray,
+                    sizes: List[int],
+                    ufunc: np.ufunc,
+                    fill: float) -> Dict[int, np.ndarray]:
+    results = dict()
+    result, prev_size = grid, 1
+    for size in sorted(set(sizes)):
+        result = box_extrema(result,
+                             size - prev_size + 1,
+                             ufunc,
+                             fill,
+                             lo=size // 2 - prev_size // 2)
+        results[size], prev_size = result, size
+
+    return results
+
+
+def summed_area_table(grid: np.ndarray) -> np.ndarray:
+    table = np.zeros(grid.shape[:-2] + (grid.shape[-2] + 1, grid.shape[-1] + 1),
+                     dtype=np.result_type(grid.dtype, np.int64))
+    np.cumsum(grid, axis=-2, out=table[..., 1:, 1:])
+    np.cumsum(table[..., 1:, 1:], axis=-1, out=table[..., 1:, 1:])
+    return table
+
+
+def box_sums(table: np.ndarray, size: int) -> np.ndarray:
+    n_rows, n_columns = table.shape[-2] - 1, table.shape[-1] - 1
+    lo = size // 2
+
+    rows = np.arange(n_rows) - lo
+    r0 = rows.clip(0, n_rows)[:, None]
+    r1 = (rows + size).clip(0, n_rows)[:, None]
+    columns = np.arange(n_columns) - lo
+    c0 = columns.clip(0, n_columns)[None, :]
+    c1 = (columns + size).clip(0, n_columns)[None, :]
+
+    return (table[..., r1, c1] - table[..., r0, c1]
+            - table[..., r1, c0] + table[..., r0, c0])
+
+
+def cell_box_sums(table: np.ndarray,
+                  cells: np.ndarray,
+                  size: int) -> np.ndarray:
+    n_rows, n_columns = table.shape[-2] - 1, table.shape[-1] - 1
+    lo = size // 2
+
+    rows = np.asarray(cells) // grid_n_columns - lo
+    r0, r1 = rows.clip(0, n_rows), (rows + size).clip(0, n_rows)
+    columns = np.asarray(cells) % grid_n_columns - lo
+    c0, c1 = columns.clip(0, n_columns), (columns + size).clip(0, n_columns)
+
+    return (table[..., r1, c1] - table[..., r0, c1]
+            - table[..., r1, c0] + table[..., r0, c0])
+
+
+def to_grid(array: np.ndarray) -> np.ndarray:
+    n_cells = grid_n_rows * grid_n_columns
+    grid = np.full(array.shape[:-1] + (n_cells, ), np.nan, dtype=array.dtype)
+
+    min_len = min(n_cells, array.shape[-1])
+    grid[..., :min_len] = array[..., :min_len]
+
+    return grid.reshape(array.shape[:-1] + (grid_n_rows, grid_n_columns))
+
+
+def pool_grid(array: np.ndarray,
+              kernel_sizes: Union[int, List[int]],
+              funcs: List[str]) -> Dict[Tuple[int, str], np.ndarray]:
+    kernel_sizes = [kernel_sizes] if isinstance(kernel_sizes, int) else kernel_sizes
+    grid = to_grid(array)
+    isnan = np.isnan(grid)
+
+    counts_table = summed_area_table(~isnan)
+    sums_table = (summed_area_table(np.where(isnan, 0, grid))
+                  if 'mean' in funcs else None)
+    extrema = {'max': (np.maximum, -np.inf),
+               'min': (np.minimum, np.inf), }
+    pyramids = {func: pyramid_extrema(np.where(isnan, extrema[func][1], grid),
+                                      kernel_sizes,
+                                      *extrema[func])
+                for func in funcs if func in extrema}
+
+    results = dict()
+    for size in kernel_sizes:
+        counts = box_sums(counts_table, size)
+        empty = counts == 0
+
+        for func in funcs:
+            if func == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = box_sums(sums_table, size) / counts
+            elif func in pyramids:
+                result = pyramids[func][size]
+            else:
+                raise NotImplementedError
+
+            result = result.astype(array.dtype)
+            result[empty] = np.nan
+            results[size, func] = result.reshape(array.shape[:-1] + (-1, ))
+
+    return results
+
+
+def neighbor_offsets(kernel_size: int) -> np.ndarray:
+    lo = kernel_size // 2
+    steps = np.arange(kernel_size) - lo
+    return np.stack([np.repeat(steps, kernel_size),
+                     np.tile(steps, kernel_size), ])
+
+
+def pool_cells(array: np.ndarray,
+               cells: np.ndarray,
+               kernel_sizes: Union[int, List[int]],
+               funcs: List[str]) -> Dict[Tuple[int, str], np.ndarray]:
+    kernel_sizes = [kernel_sizes] if isinstance(kernel_sizes, int) else kernel_sizes
+    cells = np.asarray(cells)
+    row_offsets, column_offsets = neighbor_offsets(max(kernel_sizes))
+
+    rows = cells[:, None] // grid_n_columns + row_offsets[None, :]
+    columns = cells[:, None] % grid_n_columns + column_offsets[None, :]
+    neighbors = rows * grid_n_columns + columns
+    inside = ((rows >= 0) & (rows < grid_n_rows)
+              & (columns >= 0) & (columns < grid_n_columns)
+              & (neighbors < array.shape[-1]))
+
+    all_values = np.where(inside, array[..., np.where(inside, neighbors, 0)], np.nan)
+
+    results = dict()
+    for size in kernel_sizes:
+        lo, hi = -(size // 2), size - 1 - size // 2
+        window = ((row_offsets >= lo) & (row_offsets <= hi)
+                  & (column_offsets >= lo) & (column_offsets <= hi))
+        values = all_values[..., window]
+        isnan = np.isnan(values)
+
+        counts = (~isnan).sum(axis=-1)
+        empty = counts == 0
+
+        for func in funcs:
+            if func == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = np.where(isnan, 0, values).sum(axis=-1) / counts
+            elif func == 'max':
+                result = np.where(isnan, -np.inf, values).max(axis=-1)
+            elif func == 'min':
+                result = np.where(isnan, np.inf, values).min(axis=-1)
+            else:
+                raise NotImplementedError
+
+            result = result.astype(array.dtype)
+            result[empty] = np.nan
+            results[size, func] = result
+
+    return results
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+from typing import Union
+
+import numpy as np
+import pandas as pd
+import xarray as xa
+
+
+# ru_maxrss is the process-wide high-water mark, so per-stage deltas are
+# only attributable when stages do not overlap (profiling runs calcers
+# sequentially).
+def peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def table_rows(table: Union[pd.DataFrame, xa.Dataset]) -> int:
+    if isinstance(table, xa.Dataset):
+        return int(np.prod(list(table.sizes.values())))
+    return len(table)
+
+
+def table_nbytes(table: Union[pd.DataFrame, xa.Dataset]) -> int:
+    if isinstance(table, xa.Dataset):
+        return int(table.nbytes)
+    return int(table.memory_usage(deep=True).sum())
+
+
+class Profiler(object):
+    def __init__(self, profile_path: str = None) -> None:
+        super().__init__()
+        self.profile_path = profile_path
+        self.records = list()
+        self.profiles = dict()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self,
+              name: str,
+              rows_in: int = None,
+              profile: bool = False):
+        record = {'stage': name,
+                  'rows_in': rows_in,
+                  'rows_out': None,
+                  'bytes_out': None, }
+
+        profiler = None
+        if profile and self.profile_path is not None:
+            profiler = self.profiles.setdefault(name, cProfile.Profile())
+
+        start_rss = peak_rss()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_path, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_path,
+                                                 f"{name.replace(':', '_')}.prof"))
+
+            record.update(wall_time=time.perf_counter() - start_wall,
+                          cpu_time=time.process_time() - start_cpu,
+                          peak_rss_delta=peak_rss() - start_rss)
+            with self.lock:
+                self.records.append(record)
+
+    def output(self,
+               record: dict,
+               table: Union[pd.DataFrame, xa.Dataset]) -> None:
+        record.update(rows_out=table_rows(table),
+                      bytes_out=table_nbytes(table))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.lock:
+            report = {'peak_rss': peak_rss(),
+                      'stages': list(self.records), }
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
@@ -4,7 +4,6 @@ import re
 from typing import Union, Tuple
 
 import numpy as np
-from numpy.lib.stride_tricks import as_strided
 import pandas as pd
 import xarray as xa
 import geopandas as gpd
@@ -27,45 +26,54 @@ grid_n_rows = int(np.ceil((grib_lat_max - grib_lat_min) / grid_step))
 grid_n_columns = int(np.ceil((grib_lon_max - grib_lon_min) / grid_step))
 
 
+def get_grid_index(lon, lat):
+    longitudes = np.arange(grib_lon_min, grib_lon_max, grid_step).round(1)
+
+    col_n = len(longitudes)
+    col_i = ((lon - grib_lon_min) / grid_step).astype(int)
+    row_i = ((lat - grib_lat_min) / grid_step).astype(int)
+
+    return (row_i * col_n + col_i).astype(np.int32)
+
+
 def set_grid_index(data: Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame], 
                    lon_col: str,
                    lat_col: str, ) -> None:
-    longitudes = np.arange(grib_lon_min, grib_lon_max, grid_step).round(1)
+    data['grid_index'] = get_grid_index(data[lon_col], data[lat_col])
 
-    col_n = len(longitudes)
-    col_i = ((data[lon_col] - grib_lon_min) / grid_step).astype(int)
-    row_i = ((data[lat_col] - grib_lat_min) / grid_step).astype(int)
-
-    data['grid_index'] = (row_i * col_n + col_i).astype(int)
-
-
-def make_pooling(array: np.ndarray,
-                 kernel_size: int,
-                 func: callable) -> np.ndarray:
-    input = np.full(shape=grid_n_rows * grid_n_columns,
-                    fill_value=np.nan,
-                    dtype=array.dtype)
-
-    min_len = min(len(input), len(array))
-    input[:min_len] = array[:min_len]
-
-    shape = (grid_n_rows, grid_n_columns)
-    padded = np.pad(input.reshape(shape),
-                    pad_width=tuple([kernel_size // 2 for _ in shape]),
-                    constant_values=np.nan)
-    
-    item_size = array.strides[0]
-    pooling_shape = (shape[0], shape[1],
-                     kernel_size, kernel_size)
-    pooling_strides = (padded.shape[1] * item_size, item_size, 
-                       padded.shape[1] * item_size, item_size, )
-    polling = as_strided(padded, shape=pooling_shape, strides=pooling_strides)
-
-    mask = (~np.isnan(polling)).any(axis=(2,3))
-    result = np.full(input.shape, np.nan, dtype=input.dtype)
-    result[mask.reshape(-1)] = func(polling[mask], axis=(1,2)).reshape(-1)
-    
-    return result
+
+def to_day_ordinal(dates) -> np.ndarray:
+    codes, uniques = pd.factorize(np.asarray(dates))
+    return (np.asarray(pd.to_datetime(uniques), dtype='datetime64[D]')
+            .astype(np.int32)[codes])
+
+
+def set_day_ordinal(data: pd.DataFrame, dt_col: str = 'dt') -> None:
+    data['day'] = to_day_ordinal(data[dt_col])
+
+
+def to_years(days: np.ndarray) -> np.ndarray:
+    return np.unique(np.asarray(days)
+                     .astype('datetime64[D]')
+                     .astype('datetime64[Y]')
+                     .astype(int) + 1970)
+
+
+def from_day_ordinal(days: np.ndarray) -> pd.Index:
+    uniques, codes = np.unique(np.asarray(days), return_inverse=True)
+    return pd.Index(pd.to_datetime(uniques.astype('datetime64[D]'))
+                    .strftime('%Y-%m-%d')[codes])
+
+
+def grid_bbox(grid_idxs: np.ndarray, margin: int = 0) -> Tuple[float, float, float, float]:
+    grid_idxs = np.asarray(grid_idxs)
+    rows = grid_idxs // grid_n_columns
+    cols = grid_idxs % grid_n_columns
+
+    return (grib_lon_min + (cols.min() - margin - 0.5) * grid_step,
+            grib_lon_min + (cols.max() + margin + 1.5) * grid_step,
+            grib_lat_min + (rows.min() - margin - 0.5) * grid_step,
+            grib_lat_min + (rows.max() + margin + 1.5) * grid_step, )
 
 
 def camel2snake(name: str) -> str:
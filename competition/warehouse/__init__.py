@@ -2,8 +2,11 @@ import os
 import logging
 from typing import List, Union
 
+import numpy as np
+
 from .engine import Engine
-from ..utils import era5_all_metrics, era5_all_years
+from ..profiling import Profiler
+from ..utils import era5_all_metrics, era5_all_years, to_years
 
 
 class Warehouse:
@@ -18,8 +21,17 @@ class Warehouse:
                use_geo: bool = True,
                use_era5: bool = True, 
                era5_metrics: Union[str, List[str]] = '*',
-               era5_years: Union[str, List[str]] = '*') -> Engine:
-        engine = Engine()
+               era5_years: Union[str, List[str]] = '*',
+               max_bytes: int = None,
+               cache_path: str = None,
+               workers: int = None,
+               ingest_window: int = 31,
+               profiler: Profiler = None) -> Engine:
+        if workers is not None and cache_path is None:
+            raise ValueError('Parallel ingestion requires cache_path')
+        engine = Engine(max_bytes=max_bytes,
+                        cache_path=cache_path,
+                        profiler=profiler)
 
         self.append(engine, 'history', 'train_raw.csv')
 
@@ -43,10 +55,25 @@ class Warehouse:
                                 f'{name}_{year}',
                                 'ERA5_data/' + f'{name}_{year}.grib')
 
+            if workers is not None:
+                sample_years = self.get_years(engine, ingest_window)
+                names = [f'{name}_{year}'
+                         for name in metrics
+                         for year in years
+                         if int(year) in sample_years]
+                logging.info(f'Ingest data - {len(names)} files, {workers} workers')
+                engine.ingest(names, workers)
+
         return engine
 
+    def get_years(self, engine: Engine, window: int) -> List[int]:
+        days = engine.get_table('sample')['day'].values
+        days = np.arange(days.min() - window, days.max() + 1)
+
+        return to_years(days).tolist()
+
     def append(self, engine: Engine, name: str, filename: str):
-        logging.info(f'Read data - {name}')
+        logging.info(f'Register data - {name}')
         path = os.path.join(self.data_path, filename)        
         engine.register_table(name, path)
 
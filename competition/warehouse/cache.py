@@ -0,0 +1,81 @@
+import os
+import json
+import shutil
+import hashlib
+from contextlib import contextmanager
+
+import numpy as np
+import xarray as xa
+
+
+def file_fingerprint(path: str) -> str:
+    path = os.path.abspath(str(path))
+    stat = os.stat(path)
+    return f'{path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+@contextmanager
+def atomic_directory(path: str):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        yield tmp_path
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+class ArrayCache(object):
+    meta_filename = 'meta.json'
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, source: str) -> str:
+        token = file_fingerprint(source)
+        return hashlib.sha1(token.encode()).hexdigest()[:16]
+
+    def location(self, source: str) -> str:
+        name = os.path.splitext(os.path.basename(str(source)))[0]
+        return os.path.join(self.path, f'{name}_{self.key(source)}')
+
+    def exists(self, source: str) -> bool:
+        return os.path.exists(os.path.join(self.location(source),
+                                           self.meta_filename))
+
+    def save(self, source: str, ds: xa.Dataset) -> None:
+        meta = {'source': os.path.abspath(str(source)),
+                'coords': dict(),
+                'data_vars': dict(), }
+        with atomic_directory(self.location(source)) as tmp_location:
+            for kind, items in [('coords', ds.coords.items()),
+                                ('data_vars', ds.data_vars.items()), ]:
+                for name, array in items:
+                    np.save(os.path.join(tmp_location, f'{name}.npy'),
+                            np.ascontiguousarray(array.values))
+                    meta[kind][name] = {'dims': list(array.dims),
+                                        'attrs': array.attrs, }
+
+            with open(os.path.join(tmp_location, self.meta_filename), 'w') as file:
+                json.dump(meta, file, default=str)
+
+    def load(self, source: str) -> xa.Dataset:
+        location = self.location(source)
+        with open(os.path.join(location, self.meta_filename), 'r') as file:
+            meta = json.load(file)
+
+        def read(kind: str) -> dict:
+            return {name: xa.Variable(item['dims'],
+                                      np.load(os.path.join(location, f'{name}.npy'),
+                                              mmap_mode='r'),
+                                      attrs=item['attrs'])
+                    for name, item in meta[kind].items()}
+
+        return xa.Dataset(read('data_vars'), coords=read('coords'))
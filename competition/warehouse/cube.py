@@ -0,0 +1,106 @@
+import os
+import json
+from typing import List, Tuple
+
+import numpy as np
+import xarray as xa
+
+from .cache import atomic_directory
+from ..utils import (grid_n_rows,
+                     grid_n_columns,
+                     get_grid_index,
+                     to_day_ordinal, )
+
+
+def grib_variables(ds: xa.Dataset) -> List[str]:
+    return [name for name in ds.data_vars if name != 'grid_index']
+
+
+def daily_grid_means(ds: xa.Dataset,
+                     variables: List[str] = None,
+                     batch_days: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+    variables = grib_variables(ds) if variables is None else variables
+    n_cells = grid_n_rows * grid_n_columns
+
+    days, day_pos = np.unique(to_day_ordinal(ds['time'].values),
+                              return_inverse=True)
+    if len(days) == 0:
+        return days, np.full((0, n_cells, len(variables)), np.nan, dtype=np.float32)
+
+    lon, lat = np.meshgrid(ds['longitude'].values, ds['latitude'].values)
+    grid = get_grid_index(lon, lat).reshape(-1)
+    valid = (grid >= 0) & (grid < n_cells)
+    grid = grid[valid]
+
+    values = np.full((len(days), n_cells, len(variables)), np.nan, dtype=np.float32)
+    for v, name in enumerate(variables):
+        array = ds[name].transpose('time', ..., 'latitude', 'longitude').values
+        array = array.reshape(array.shape[0], -1, valid.shape[0])
+
+        for start in range(0, len(days), batch_days):
+            stop = min(start + batch_days, len(days))
+            times = (day_pos >= start) & (day_pos < stop)
+
+            block = array[times][:, :, valid]
+            cells = ((day_pos[times] - start)[:, None, None] * n_cells
+                     + grid[None, None, :])
+            cells = np.broadcast_to(cells, block.shape)
+            mask = ~np.isnan(block)
+
+            size = (stop - start) * n_cells
+            sums = np.bincount(cells[mask], weights=block[mask], minlength=size)
+            counts = np.bincount(cells[mask], minlength=size)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values[start:stop, :, v] = (sums / counts).reshape(-1, n_cells)
+
+    return days, values
+
+
+class GridCube(object):
+    meta_filename = 'meta.json'
+    values_filename = 'values.npy'
+
+    def __init__(self,
+                 days: np.ndarray,
+                 variables: List[str],
+                 values: np.ndarray) -> None:
+        super().__init__()
+        self.days = np.asarray(days)
+        self.variables = list(variables)
+        self.values = values
+
+    def day_index(self, days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        days = np.asarray(days)
+        if len(self.days) == 0:
+            return (np.zeros(len(days), dtype=np.int64),
+                    np.zeros(len(days), dtype=bool))
+
+        pos = np.minimum(np.searchsorted(self.days, days), len(self.days) - 1)
+        return pos, self.days[pos] == days
+
+    @classmethod
+    def build(cls, ds: xa.Dataset) -> 'GridCube':
+        variables = grib_variables(ds)
+        days, values = daily_grid_means(ds, variables)
+        return cls(days, variables, values)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, cls.meta_filename))
+
+    def save(self, path: str) -> None:
+        with atomic_directory(path) as tmp_path:
+            np.save(os.path.join(tmp_path, self.values_filename),
+                    np.ascontiguousarray(self.values, dtype=np.float32))
+            with open(os.path.join(tmp_path, self.meta_filename), 'w') as file:
+                json.dump({'days': self.days.tolist(),
+                           'variables': self.variables, }, file)
+
+    @classmethod
+    def load(cls, path: str) -> 'GridCube':
+        with open(os.path.join(path, cls.meta_filename), 'r') as file:
+            meta = json.load(file)
+
+        return cls(np.array(meta['days'], dtype=np.int32),
+                   meta['variables'],
+                   np.load(os.path.join(path, cls.values_filename), mmap_mode='r'))
@@ -1,30 +1,294 @@
-from typing import Union
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import cfgrib
 import xarray as xa
 import geopandas as gpd
 
+from .cache import ArrayCache, file_fingerprint
+from .cube import GridCube
+from ..utils import to_day_ordinal, set_day_ordinal
+from ..profiling import Profiler, table_rows, table_nbytes
+
+
+TableHandle = namedtuple('TableHandle', ['path', 'format', 'loader', ])
+
+
+def read_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    if 'dt' in df.columns:
+        set_day_ordinal(df, 'dt')
+    if 'grid_index' in df.columns:
+        df['grid_index'] = df['grid_index'].astype(np.int32)
+    return df
+
+
+def read_grib(path: str) -> xa.Dataset:
+    return xa.merge([xd.reset_coords()[list(xd.data_vars)]
+                     for xd in cfgrib.open_datasets(path)])
+
+
+def read_geojson(path: str) -> gpd.GeoDataFrame:
+    return gpd.read_file(path)
+
+
+def select_grib(ds: xa.Dataset,
+                dates: list = None,
+                bbox: Tuple[float, float, float, float] = None) -> xa.Dataset:
+    indexers = dict()
+    if dates is not None:
+        days = pd.to_datetime(ds['time'].values).normalize()
+        indexers['time'] = np.flatnonzero(days.isin(pd.to_datetime(list(dates))))
+    if bbox is not None:
+        lon_min, lon_max, lat_min, lat_max = bbox
+        lon = ds['longitude'].values
+        lat = ds['latitude'].values
+        indexers['longitude'] = np.flatnonzero((lon >= lon_min) & (lon <= lon_max))
+        indexers['latitude'] = np.flatnonzero((lat >= lat_min) & (lat <= lat_max))
+
+    return ds.isel(indexers).load()
+
+
+def convert_grib(cache_path: str, path: str) -> float:
+    start = time.perf_counter()
+    cache = ArrayCache(cache_path)
+    if not cache.exists(path):
+        cache.save(path, read_grib(path))
+    return time.perf_counter() - start
+
 
 class Engine(object):
-    def __init__(self) -> None:
+    loaders = {'csv': read_csv,
+               'grib': read_grib,
+               'geojson': read_geojson, }
+
+    def __init__(self,
+                 max_bytes: int = None,
+                 cache_path: str = None,
+                 profiler: Profiler = None) -> None:
         super().__init__()
-        self.tables = dict()
+        self.max_bytes = max_bytes
+        self.cache = ArrayCache(cache_path) if cache_path is not None else None
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.handles = dict()
+        self.tables = OrderedDict()
+        self.sizes = dict()
+        self.cubes = dict()
+        self.shared = dict()
+        self.lock = threading.RLock()
+        self.name_locks = dict()
 
     def register_table(self,
                        name: str,
                        path: str) -> None:
-        if path.endswith('.csv'):
-            self.tables[name] = pd.read_csv(path)
-        elif path.endswith('.grib'):
-            self.tables[name] = xa.merge([xd.reset_coords()[list(xd.data_vars)]
-                                          for xd in cfgrib.open_datasets(path)])
-        elif path.endswith('.geojson'):
-            self.tables[name] = gpd.read_file(path)
-        elif path.endswith('.pbf'):
+        format = os.path.splitext(str(path))[1][1:]
+        if format not in self.loaders:
             raise NotImplementedError
-        else:
+
+        self.handles[name] = TableHandle(path, format, self.loaders[format])
+        self.drop_table(name)
+
+    def ingest(self, names: List[str], workers: int) -> None:
+        if self.cache is None:
+            raise ValueError('Parallel ingestion requires cache_path')
+
+        names = [name for name in names
+                 if (self.handles[name].format == 'grib'
+                     and not self.cache.exists(self.handles[name].path))]
+        if not names:
+            return
+
+        with self.profiler.stage('ingest', rows_in=len(names)):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(convert_grib,
+                                           self.cache.path,
+                                           self.handles[name].path): name
+                           for name in names}
+                for i, future in enumerate(as_completed(futures), 1):
+                    logging.info(f'Ingest data - {futures[future]} '
+                                 f'({i}/{len(names)}, {future.result():.1f}s)')
+
+    def set_table(self,
+                  name: str,
+                  table: Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame]) -> None:
+        self.handles[name] = TableHandle(None, 'memory', lambda path: table)
+        with self.lock:
+            self.tables[name] = table
+            self.sizes[name] = table_nbytes(table)
+
+    @contextmanager
+    def override_table(self,
+                       name: str,
+                       table: Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame]):
+        handle = self.handles.get(name)
+        self.set_table(name, table)
+        try:
+            yield self
+        finally:
+            self.drop_table(name)
+            if handle is not None:
+                self.handles[name] = handle
+            else:
+                del self.handles[name]
+
+    def fingerprint(self, name: str) -> str:
+        if self.handles[name].path is None:
+            return None
+        return file_fingerprint(self.handles[name].path)
+
+    def get_days(self, name: str) -> np.ndarray:
+        return np.unique(to_day_ordinal(self.get_grib(name)['time'].values))
+
+    def get_table(self,
+                  name: str,
+                  dates: list = None,
+                  bbox: Tuple[float, float, float, float] = None) -> Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame]:
+        if dates is not None or bbox is not None:
+            return self.select(name, dates, bbox)
+
+        return self.remember(name, lambda: self.load(name))
+
+    def get_cube(self, name: str) -> GridCube:
+        if self.cache is None:
+            return self.remember(f'{name}:cube',
+                                 lambda: self.build_cube(name),
+                                 lambda cube: int(cube.values.nbytes))
+
+        return self.memoize(self.cubes, name, lambda: self.build_cube(name))
+
+    def remember(self,
+                 key: str,
+                 factory: callable,
+                 nbytes: callable = table_nbytes):
+        with self.lock:
+            if key in self.tables:
+                self.tables.move_to_end(key)
+                return self.tables[key]
+
+        with self.name_lock(f'table:{key}'):
+            with self.lock:
+                if key in self.tables:
+                    return self.tables[key]
+
+            value = factory()
+
+            with self.lock:
+                self.tables[key] = value
+                self.sizes[key] = nbytes(value)
+                self.evict(keep=key)
+
+        return value
+
+    def get_shared(self, name: str, factory: callable):
+        return self.memoize(self.shared, name, factory)
+
+    def name_lock(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.name_locks.setdefault(key, threading.Lock())
+
+    def memoize(self, store: dict, name: str, factory: callable):
+        with self.lock:
+            if name in store:
+                return store[name]
+
+        with self.name_lock(f'{id(store)}:{name}'):
+            with self.lock:
+                if name in store:
+                    return store[name]
+
+            value = factory()
+            with self.lock:
+                store[name] = value
+
+        return value
+
+    def build_cube(self, name: str) -> GridCube:
+        handle = self.handles[name]
+        if handle.format != 'grib':
             raise NotImplementedError
 
-    def get_table(self, name: str) -> Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame]:
-        return self.tables[name]
+        with self.profiler.stage(f'cube:{name}') as record:
+            if self.cache is None:
+                logging.info(f'Build cube - {name}')
+                cube = GridCube.build(self.get_table(name))
+            else:
+                path = self.cache.location(handle.path) + '.cube'
+                if not GridCube.exists(path):
+                    logging.info(f'Build cube - {name}')
+                    GridCube.build(self.load(name)).save(path)
+                cube = GridCube.load(path)
+            record.update(rows_out=int(np.prod(cube.values.shape[:2])),
+                          bytes_out=int(cube.values.nbytes))
+
+        return cube
+
+    def get_grib(self, name: str) -> xa.Dataset:
+        if self.handles[name].format != 'grib':
+            raise NotImplementedError
+
+        with self.lock:
+            ds = self.tables.get(name)
+            if ds is not None:
+                self.tables.move_to_end(name)
+
+        if ds is None and self.cache is not None:
+            ds = self.load(name)
+        elif ds is None:
+            ds = self.get_table(name)
+
+        return ds
+
+    def select(self,
+               name: str,
+               dates: list = None,
+               bbox: Tuple[float, float, float, float] = None) -> xa.Dataset:
+        ds = self.get_grib(name)
+
+        logging.info(f'Select table - {name}')
+        with self.profiler.stage(f'select:{name}', rows_in=table_rows(ds)) as record:
+            ds = select_grib(ds, dates, bbox)
+            self.profiler.output(record, ds)
+
+        return ds
+
+    def load(self, name: str) -> Union[pd.DataFrame, xa.Dataset, gpd.GeoDataFrame]:
+        handle = self.handles[name]
+        with self.profiler.stage(f'load:{name}') as record:
+            if handle.format != 'grib' or self.cache is None:
+                logging.info(f'Load table - {name}')
+                table = handle.loader(handle.path)
+            else:
+                if not self.cache.exists(handle.path):
+                    logging.info(f'Load table - {name}')
+                    self.cache.save(handle.path, handle.loader(handle.path))
+
+                logging.info(f'Load table from cache - {name}')
+                table = self.cache.load(handle.path)
+            self.profiler.output(record, table)
+
+        return table
+
+    def drop_table(self, name: str) -> None:
+        with self.lock:
+            self.tables.pop(name, None)
+            self.sizes.pop(name, None)
+
+    def evict(self, keep: str = None) -> None:
+        if self.max_bytes is None:
+            return
+
+        for name in list(self.tables.keys()):
+            if sum(self.sizes.values()) <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            logging.info(f'Evict table - {name}')
+            self.drop_table(name)
@@ -1,4 +1,5 @@
 import os
+import sys
 import pathlib
 import logging
 import warnings
@@ -8,6 +9,7 @@ import yaml
 from competition.repository import Repository
 from competition.warehouse import Warehouse
 from competition.featurise import Featuriser
+from competition.profiling import Profiler
 
 
 warnings.simplefilter("ignore")
@@ -32,10 +34,14 @@ if __name__ == "__main__":
     for name, type_name in config['repository'].items():
         repository.register(name, type_name)
 
+    profile = '--profile' in sys.argv[1:]
+    profiler = Profiler(output_path / 'profile' if profile else None)
     engine = (Warehouse(input_path, train=False)
-              .create(**config['warehouse']['create_args']))
+              .create(**config['warehouse']['create_args'], profiler=profiler))
 
-    features_df = (Featuriser(engine, repository)
+    features_df = (Featuriser(engine, repository,
+                              workers=config['featurise'].get('workers', 1),
+                              dtypes=config['featurise'].get('dtypes'))
                    .get_features(config['featurise']['calcers']))
 
     pipeline = (repository
@@ -45,3 +51,6 @@ if __name__ == "__main__":
     predicts_df = pipeline.predict(features_df)
     predicts_df.to_csv(os.path.join(output_path, "output.csv"),
                        index_label="id", )
+
+    if profile:
+        profiler.save(os.path.join(output_path, 'profile.json'))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from competition.featurise.history import FireHistory
+
+
+def brute_counts(days, cells, first_days, last_days, query_cells):
+    pairs = set(zip(days.tolist(), cells.tolist()))
+    return np.array([sum(1 for day, cell in pairs
+                         if cell == query_cell and first <= day <= last)
+                     for first, last, query_cell in zip(first_days, last_days, query_cells)])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_counts(seed):
+    rng = np.random.default_rng(seed)
+    days = rng.integers(100, 160, 300)
+    cells = rng.integers(0, 20, 300)
+    history = FireHistory(days, cells)
+
+    query_cells = rng.integers(-1, 22, 500)
+    first_days = rng.integers(80, 180, 500)
+    last_days = first_days + rng.integers(-3, 40, 500)
+
+    np.testing.assert_array_equal(history.counts(first_days, last_days, query_cells),
+                                  brute_counts(days, cells, first_days, last_days, query_cells))
+    np.testing.assert_array_equal(history.flags(first_days, query_cells),
+                                  brute_counts(days, cells, first_days, first_days, query_cells) > 0)
+
+
+def test_decode_round_trip():
+    days, cells = np.array([5, 3, 5, 9]), np.array([7, 2, 7, 0])
+    history = FireHistory(days, cells)
+
+    assert len(history) == 3
+    assert sorted(zip(*history.decode())) == [(3, 2), (5, 7), (9, 0)]
+
+
+def test_counts_empty_history():
+    history = FireHistory(np.array([], dtype=int), np.array([], dtype=int))
+
+    np.testing.assert_array_equal(history.counts(np.array([0, 5]), np.array([10, 5]), np.array([1, 2])),
+                                  [0, 0])
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from competition.pooling import (rolling_reduce,
+                                 summed_area_table,
+                                 cell_box_sums,
+                                 pool_grid,
+                                 pool_cells, )
+from competition.utils import grid_n_rows, grid_n_columns
+
+
+n_cells = grid_n_rows * grid_n_columns
+reducers = {'mean': np.nanmean, 'max': np.nanmax, 'min': np.nanmin, 'sum': np.nansum, }
+
+
+def random_array(shape, nan_rate=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    array = rng.normal(size=shape).astype(np.float32)
+    array[rng.random(shape) < nan_rate] = np.nan
+    return array
+
+
+def edge_cells():
+    rows = [0, 1, grid_n_rows // 2, grid_n_rows - 2, grid_n_rows - 1]
+    columns = [0, 1, grid_n_columns // 2, grid_n_columns - 2, grid_n_columns - 1]
+    return np.array([r * grid_n_columns + c for r in rows for c in columns])
+
+
+def box_values(values, cell, size):
+    row, column = divmod(int(cell), grid_n_columns)
+    lo = size // 2
+    rows = range(max(row - lo, 0), min(row - lo + size, grid_n_rows))
+    columns = range(max(column - lo, 0), min(column - lo + size, grid_n_columns))
+    return np.array([values[..., r * grid_n_columns + c]
+                     for r in rows for c in columns
+                     if r * grid_n_columns + c < values.shape[-1]])
+
+
+def brute_reduce(func, values):
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).all():
+        return np.nan
+    return reducers[func](values)
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 7])
+def test_rolling_reduce(window):
+    series = random_array((20, 4), nan_rate=0.4)
+    series[:, 0] = np.nan
+    funcs = ['mean', 'max', 'min', 'sum']
+
+    results = rolling_reduce(series, window, funcs)
+
+    for func in funcs:
+        expected = np.array([[brute_reduce(func, series[max(t - window + 1, 0):t + 1, j])
+                              for j in range(series.shape[1])]
+                             for t in range(series.shape[0])])
+        np.testing.assert_allclose(results[func], expected, rtol=1e-5, atol=1e-5)
+        assert results[func].dtype == series.dtype
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 4, 5])
+def test_cell_box_sums(size):
+    grid = random_array((2, n_cells), nan_rate=0)
+    table = summed_area_table(grid.reshape(2, grid_n_rows, grid_n_columns))
+    cells = edge_cells()
+
+    result = cell_box_sums(table, cells, size)
+
+    expected = np.stack([box_values(grid, cell, size).sum(axis=0) for cell in cells],
+                        axis=-1)
+    np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-3)
+
+
+
+def test_cell_box_sums_keeps_integer_counts():
+    grid = np.random.default_rng(0).integers(0, 3, n_cells)
+    table = summed_area_table(grid.reshape(grid_n_rows, grid_n_columns))
+    cells = edge_cells()
+
+    result = cell_box_sums(table, cells, 3)
+
+    assert np.issubdtype(result.dtype, np.integer)
+    np.testing.assert_array_equal(result, [box_values(grid, cell, 3).sum() for cell in cells])
+
+@pytest.mark.parametrize('kernel_sizes', [[1], [2], [3], [2, 3, 5], [4, 7]])
+def test_pool_grid(kernel_sizes):
+    array = random_array((2, n_cells - 17))
+    funcs = ['mean', 'max', 'min']
+    cells = edge_cells()
+    cells = cells[cells < array.shape[-1]]
+
+    results = pool_grid(array, kernel_sizes, funcs)
+
+    for size in kernel_sizes:
+        for func in funcs:
+            assert results[size, func].shape == (2, n_cells)
+            expected = np.stack([[brute_reduce(func, box_values(array[day], cell, size))
+                                  for cell in cells]
+                                 for day in range(array.shape[0])])
+            np.testing.assert_allclose(results[size, func][:, cells], expected,
+                                       rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('kernel_sizes', [[1], [2], [3], [2, 3, 5], [4, 7]])
+def test_pool_cells(kernel_sizes):
+    array = random_array((2, n_cells - 17))
+    funcs = ['mean', 'max', 'min']
+    cells = edge_cells()
+
+    results = pool_cells(array, cells, kernel_sizes, funcs)
+
+    for size in kernel_sizes:
+        for func in funcs:
+            expected = np.stack([[brute_reduce(func, box_values(array[day], cell, size))
+                                  for cell in cells]
+                                 for day in range(array.shape[0])])
+            np.testing.assert_allclose(results[size, func], expected,
+                                       rtol=1e-5, atol=1e-5)
+
+
+def test_pool_cells_matches_pool_grid():
+    array = random_array((3, n_cells))
+    cells = np.random.default_rng(1).integers(0, n_cells, 200)
+    kernel_sizes, funcs = [2, 3, 6], ['mean', 'max', 'min']
+
+    grid_results = pool_grid(array, kernel_sizes, funcs)
+    cell_results = pool_cells(array, cells, kernel_sizes, funcs)
+
+    for key, result in cell_results.items():
+        np.testing.assert_allclose(result, grid_results[key][:, cells],
+                                   rtol=1e-5, atol=1e-5)
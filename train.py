@@ -4,11 +4,12 @@ import warnings
 import logging
 
 import yaml
-import pandas as pd
 
 from competition.repository import Repository
 from competition.warehouse import Warehouse
 from competition.featurise import Featuriser
+from competition.featurise.store import FeatureStore
+from competition.profiling import Profiler
 
 
 warnings.simplefilter("ignore")
@@ -18,25 +19,50 @@ logging.basicConfig(format="%(asctime)s %(message)s",
 logger = logging.getLogger(__name__)
 
 
+def get_featuriser(config: dict, repository: Repository) -> Featuriser:
+    profiler = Profiler(f"features/{config['name']}/profile"
+                        if config['featurise'].get('profile', False) else None)
+    engine = (Warehouse(data_path=config['warehouse']['data_path'], train=True)
+              .create(**config['warehouse']['create_args'], profiler=profiler))
+
+    return Featuriser(engine, repository,
+                      workers=config['featurise'].get('workers', 1),
+                      cache_path=config['featurise'].get('cache_path'),
+                      dtypes=config['featurise'].get('dtypes'))
+
+
 def featurise(config: dict, repository: Repository) -> None:
     name = config['name']
 
-    engine = (Warehouse(data_path=config['warehouse']['data_path'], train=True)
-              .create(**config['warehouse']['create_args']))
-    
-    features_df = (Featuriser(engine, repository)
-                   .get_features(config['featurise']['calcers']))
-    
-    features_df.to_csv(f'features/{name}_features.csv', index=False)
+    featuriser = get_featuriser(config, repository)
+
+    store = FeatureStore(f'features/{name}')
+    store.clear()
+    featuriser.write(config['featurise']['calcers'],
+                     store,
+                     chunk_days=config['featurise'].get('chunk_days'))
+    store.write_manifest(featuriser.get_manifest(config['featurise']['calcers']))
+    featuriser.profiler.save(f'features/{name}/profile.json')
+
+
+def update(config: dict, repository: Repository) -> None:
+    name = config['name']
+
+    featuriser = get_featuriser(config, repository)
+    featuriser.update(config['featurise']['calcers'],
+                      FeatureStore(f'features/{name}'),
+                      chunk_days=config['featurise'].get('chunk_days'))
+    featuriser.profiler.save(f'features/{name}/profile.json')
 
 
 def train(config: dict, repository: Repository) -> None:
     name = config['name']
-    features_df = pd.read_csv(f'features/{name}_features.csv')
+    store = FeatureStore(f'features/{name}')
 
     pipeline = (repository
                 .get_object(config['pipeline']['name'])(config['pipeline']['seed']))
-    
+    features_df = store.read(columns=pipeline.get_columns(store.columns()))
+
     pipeline.fit(features_df, config['pipeline'], repository)
 
     save_path = f'models/{name}'
@@ -57,6 +83,8 @@ def submit(config: dict, repository: Repository) -> None:
     calcers_config = config['featurise']['calcers']
     del calcers_config['target_base']
     config['featurise']['calcers'] = calcers_config
+    for arg in ['cache_path', 'workers', ]:
+        config['warehouse']['create_args'].pop(arg, None)
 
     with open(f'submits/{name}/solution.yaml', 'w') as f:
         yaml.dump(config, f)
@@ -82,14 +110,17 @@ def submit(config: dict, repository: Repository) -> None:
 
 
 tasks = {'featurise': featurise,
+         'update': update,
          'train': train, 
          'submit': submit, }
 
 
 if __name__ == '__main__':
-    task, config_name = sys.argv[1:]
+    task, config_name = [arg for arg in sys.argv[1:] if arg != '--profile']
     with open(os.path.join('configs/', config_name + '.yaml'), 'r') as f:
         config = yaml.load(f, yaml.Loader)
+    if '--profile' in sys.argv[1:]:
+        config['featurise']['profile'] = True
 
     repository = Repository()
     for name, obj_name in config['repository'].items():